@@ -1,8 +1,21 @@
+import asyncio
+import gc
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+import warnings
+
+from concurrent.futures import ThreadPoolExecutor
+from graphlib import CycleError
 from unittest.mock import Mock, call
 
 import pytest
 
 from tinypipeline import pipeline, step
+from tinypipeline.step import Step
 
 
 def test_pipeline_completion():
@@ -346,3 +359,961 @@ def test_pipeline_failure_exception_in_step():
         pipe.run()
 
     assert str(mock_step_2.side_effect) == str(context.value)
+
+def test_pipeline_runs_independent_steps_concurrently():
+    """
+    Test that steps in the same stage of a nonlinear pipeline run
+    concurrently, and that their dependents run after the whole stage.
+
+    The barrier can only be passed if both branch steps are running
+    at the same time.
+    """
+    barrier = threading.Barrier(2, timeout=5)
+    mock_step_4 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        pass
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        barrier.wait()
+
+    @step(name="step_three", description="Step three", version="1.0.0")
+    def step_three():
+        barrier.wait()
+
+    @step(name="step_four", description="Step four", version="1.0.0")
+    def step_four():
+        mock_step_4()
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {
+            step_one: [step_two, step_three],
+            step_two: [step_four],
+            step_three: [step_four],
+        }
+
+    pipe = test_pipeline()
+
+    assert pipe._get_steps() == [
+        (step_one,),
+        (step_two, step_three),
+        (step_four,),
+    ]
+
+    pipe.run()
+
+    mock_step_4.assert_called_once()
+
+# steps for the process pool tests need to be defined at module level,
+# so that they can be pickled and run in another process
+@step(name="process_step_one", description="Process step one", version="1.0.0")
+def process_step_one():
+    pass
+
+@step(name="process_step_two", description="Process step two", version="1.0.0")
+def process_step_two():
+    return sum(range(1000))
+
+@step(name="process_step_three", description="Process step three", version="1.0.0")
+def process_step_three():
+    raise ValueError("Something went wrong")
+
+@step(name="process_step_lock", description="Process step lock", version="1.0.0")
+def process_step_lock():
+    return threading.Lock()
+
+def test_pipeline_completion_with_process_executor():
+    """
+    Test that a nonlinear pipeline runs the steps within a stage in a
+    process pool, and that exceptions raised in a worker process
+    are re-raised by the pipeline.
+    """
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        executor="process",
+    )
+    def test_pipeline():
+        return {process_step_one: [process_step_two, process_step_three]}
+
+    with pytest.raises(ValueError) as context:
+        pipe = test_pipeline()
+        pipe.run()
+
+    assert "Something went wrong" == str(context.value)
+
+def test_pipeline_process_executor_unpicklable_result(capsys):
+    """
+    Test that a step in a process pool whose result can't be pickled
+    fails the pipeline, instead of its result silently being None.
+    """
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        executor="process",
+    )
+    def test_pipeline():
+        return {process_step_one: [process_step_two, process_step_lock]}
+
+    pipe = test_pipeline()
+    with pytest.raises(TypeError) as context:
+        pipe.run()
+
+    assert "pickle" in str(context.value)
+    out = capsys.readouterr().out
+    assert "exception in step [process_step_lock]" in out
+
+def test_pipeline_completion_with_user_executor():
+    """
+    Test that a nonlinear pipeline runs all of its steps on a user-supplied
+    executor, including a stage with a single step, and that the executor
+    isn't shut down.
+    """
+    mock_step_2 = Mock()
+    mock_step_3 = Mock()
+    threads = []
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        threads.append(threading.current_thread())
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        mock_step_2()
+
+    @step(name="step_three", description="Step three", version="1.0.0")
+    def step_three():
+        mock_step_3()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+
+        @pipeline(
+            name="test_pipeline",
+            description="Test pipeline",
+            version="1.0.0",
+            executor=executor,
+        )
+        def test_pipeline():
+            return {step_one: [step_two, step_three]}
+
+        pipe = test_pipeline()
+        pipe.run()
+
+        assert executor.submit(lambda: "still running").result() == "still running"
+
+    mock_step_2.assert_called_once()
+    mock_step_3.assert_called_once()
+    assert threads and threading.main_thread() not in threads
+
+def test_pipeline_failure_invalid_executor():
+    """
+    Test that the pipeline fails with a ValueError if the executor
+    is not a valid option.
+
+    Also check that the error message is correct.
+    """
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        executor="fibers",
+    )
+    def test_pipeline():
+        return []
+
+    with pytest.raises(ValueError) as context:
+        test_pipeline()
+
+    assert (
+        "Pipeline executor must be 'thread', 'process' or an Executor. "
+        "Passed 'fibers'"
+        == str(context.value)
+    )
+
+def test_pipeline_run_twice_reuses_step_order():
+    """
+    Test that a pipeline can be run more than once, and that the order
+    of the steps is only computed on the first run.
+    """
+    mock_step_1 = Mock()
+    mock_step_2 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        mock_step_1()
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        mock_step_2()
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {step_one: [step_two]}
+
+    pipe = test_pipeline()
+    pipe.run()
+    plan = pipe._plan
+    pipe.run()
+
+    assert pipe._plan is plan
+    assert mock_step_1.call_count == 2
+    assert mock_step_2.call_count == 2
+
+def test_pipeline_failure_circular_dependencies(capsys):
+    """
+    Test that the pipeline fails with a CycleError if the steps
+    have circular dependencies, and that no steps are run. The error
+    only contains the steps in the cycle, and not the steps after it.
+
+    Also check that the failure message is written by run, and not
+    when the steps are ordered.
+    """
+    mock_step_1 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        mock_step_1()
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        pass
+
+    @step(name="step_three", description="Step three", version="1.0.0")
+    def step_three():
+        pass
+
+    @step(name="step_four", description="Step four", version="1.0.0")
+    def step_four():
+        pass
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {
+            step_one: [step_two],
+            step_two: [step_three],
+            step_three: [step_two, step_four],
+        }
+
+    pipe = test_pipeline()
+    with pytest.raises(CycleError):
+        pipe._get_steps()
+
+    assert capsys.readouterr().out == ""
+
+    with pytest.raises(CycleError) as context:
+        pipe.run()
+
+    assert "Try checking for circular dependencies" in capsys.readouterr().out
+    assert context.value.args[1] == [step_two, step_three, step_two]
+    mock_step_1.assert_not_called()
+
+def test_pipeline_failure_circular_dependencies_cycle_order():
+    """
+    Test that the cycle in a CycleError lists each step before a step that
+    it runs after, in the same order as graphlib.
+    """
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        pass
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        pass
+
+    @step(name="step_three", description="Step three", version="1.0.0")
+    def step_three():
+        pass
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        quiet=True,
+    )
+    def test_pipeline():
+        return {
+            step_one: [step_two],
+            step_two: [step_three],
+            step_three: [step_one],
+        }
+
+    with pytest.raises(CycleError) as context:
+        test_pipeline().run()
+
+    assert context.value.args[1] == [step_one, step_three, step_two, step_one]
+
+def test_step_pickle_round_trip():
+    """
+    Test that a step created with the step decorator at module level
+    can be pickled, e.g. to run it in a process pool.
+    """
+    unpickled_step = pickle.loads(pickle.dumps(process_step_two))
+
+    assert unpickled_step is not process_step_two
+    assert unpickled_step._callable is process_step_two._callable
+    assert repr(unpickled_step) == repr(process_step_two)
+    assert not hasattr(unpickled_step, "__dict__")
+
+def test_pipeline_output_for_concurrent_stage(capsys):
+    """
+    Test that the output of a stage that is run concurrently lists all
+    of the running steps before the completed steps, in stage order.
+    """
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        pass
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        pass
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {step_one: [], step_two: []}
+
+    pipe = test_pipeline()
+    pipe.run()
+
+    lines = [line for line in capsys.readouterr().out.splitlines() if line]
+
+    assert lines[3:5] == ["Running step [step_one]...", "Running step [step_two]..."]
+    assert lines[5].startswith("Step [step_one] completed in ")
+    assert lines[6].startswith("Step [step_two] completed in ")
+
+def test_pipeline_failure_invalid_step_in_dict_values():
+    """
+    Test that the pipeline fails with a TypeError if there is no instance of Step,
+    in the values of a dictionary of pipeline steps.
+
+    Also check that the error message is correct.
+    """
+    mock_step_1 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        mock_step_1()
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {step_one: ["step_two"]}
+
+    with pytest.raises(TypeError) as context:
+        pipe = test_pipeline()
+        pipe.run()
+
+    assert (
+        "Not a valid step. Consider using the step decorator to "
+        "create steps for your pipeline."
+        == str(context.value)
+    )
+    mock_step_1.assert_not_called()
+
+def test_pipeline_completion_with_async_steps():
+    """
+    Test that async steps run concurrently in an event loop within a
+    stage, alongside sync steps, and that async steps can also be run
+    on their own.
+    """
+    events = []
+    mock_step_4 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    async def step_one():
+        events.append("step_one")
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    async def step_two():
+        events.append("step_two started")
+        await asyncio.sleep(0)
+        events.append("step_two finished")
+
+    @step(name="step_three", description="Step three", version="1.0.0")
+    async def step_three():
+        events.append("step_three started")
+        await asyncio.sleep(0)
+        events.append("step_three finished")
+
+    @step(name="step_four", description="Step four", version="1.0.0")
+    def step_four():
+        mock_step_4()
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {step_one: [step_two, step_three, step_four]}
+
+    pipe = test_pipeline()
+    pipe.run()
+
+    assert events == [
+        "step_one",
+        "step_two started",
+        "step_three started",
+        "step_two finished",
+        "step_three finished",
+    ]
+    mock_step_4.assert_called_once()
+
+def test_pipeline_quiet(capsys):
+    """
+    Test that a quiet pipeline runs all of its steps without writing
+    anything to stdout.
+    """
+    mock_step_1 = Mock()
+    mock_step_2 = Mock()
+    mock_step_3 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        mock_step_1()
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        mock_step_2()
+
+    @step(name="step_three", description="Step three", version="1.0.0")
+    def step_three():
+        mock_step_3()
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        quiet=True,
+    )
+    def test_pipeline():
+        return {step_one: [step_two, step_three]}
+
+    pipe = test_pipeline()
+    pipe.run()
+
+    assert capsys.readouterr().out == ""
+    mock_step_1.assert_called_once()
+    mock_step_2.assert_called_once()
+    mock_step_3.assert_called_once()
+
+def test_pipeline_quiet_concurrent_stage_results(capsys):
+    """
+    Test that a quiet pipeline returns the results of the steps in
+    concurrent stages, including async steps and steps run in a process
+    pool, without writing anything to stdout.
+    """
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        return "step 1"
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    async def step_two():
+        return "step 2"
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        quiet=True,
+    )
+    def thread_pipeline():
+        return {step_one: [], step_two: []}
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        executor="process",
+        quiet=True,
+    )
+    def process_pipeline():
+        return {process_step_one: [], process_step_two: []}
+
+    assert thread_pipeline().run() == {step_one: "step 1", step_two: "step 2"}
+    assert process_pipeline().run() == {
+        process_step_one: None,
+        process_step_two: sum(range(1000)),
+    }
+    assert capsys.readouterr().out == ""
+
+def test_pipeline_failure_exception_in_concurrent_stage():
+    """
+    Test that the pipeline fails with an Exception if there is an exception
+    in one of the steps of a concurrent stage, that the steps in the stage
+    that are still running are cancelled, and that no later stages are run.
+    """
+    mock_step_3 = Mock()
+    mock_step_4 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        pass
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    async def step_two():
+        raise Exception("Something went wrong")
+
+    @step(name="step_three", description="Step three", version="1.0.0")
+    async def step_three():
+        await asyncio.sleep(5)
+        mock_step_3()
+
+    @step(name="step_four", description="Step four", version="1.0.0")
+    def step_four():
+        mock_step_4()
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {
+            step_one: [step_two, step_three],
+            step_two: [step_four],
+            step_three: [step_four],
+        }
+
+    with pytest.raises(Exception) as context:
+        pipe = test_pipeline()
+        pipe.run()
+
+    assert "Something went wrong" == str(context.value)
+    mock_step_3.assert_not_called()
+    mock_step_4.assert_not_called()
+
+def test_step_with_bound_arguments():
+    """
+    Test that a step calls its callable with the arguments that it was
+    created with, and that a step without arguments runs the callable itself.
+    """
+    mock_step_1 = Mock()
+    mock_step_2 = Mock()
+
+    step_one = Step(
+        callable=mock_step_1,
+        name="step_one",
+        description="Step one",
+        version="1.0.0",
+        args=("data.csv",),
+        kwargs={"rows": 10},
+    )
+    step_two = Step(
+        callable=mock_step_2,
+        name="step_two",
+        description="Step two",
+        version="1.0.0",
+    )
+
+    step_one.run()
+    step_two.run()
+
+    mock_step_1.assert_called_once_with("data.csv", rows=10)
+    mock_step_2.assert_called_once_with()
+    assert step_two.run is mock_step_2
+
+def test_pipeline_keeps_step_results():
+    """
+    Test that the pipeline returns the result of each step, including
+    steps in a concurrent stage and async steps, and that a step that
+    several steps run after is only run once.
+    """
+    mock_step_1 = Mock()
+    mock_step_1.return_value = "step 1"
+
+    step_one = step(
+        callable=mock_step_1,
+        name="step_one",
+        description="Step one",
+        version="1.0.0",
+    )
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        return "step 2"
+
+    @step(name="step_three", description="Step three", version="1.0.0")
+    async def step_three():
+        return "step 3"
+
+    @step(name="step_four", description="Step four", version="1.0.0")
+    def step_four():
+        return "step 4"
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {
+            step_one: [step_two, step_three],
+            step_two: [step_four],
+            step_three: [step_four],
+        }
+
+    pipe = test_pipeline()
+    results = pipe.run()
+
+    mock_step_1.assert_called_once()
+    assert results == {
+        step_one: "step 1",
+        step_two: "step 2",
+        step_three: "step 3",
+        step_four: "step 4",
+    }
+    assert pipe._results == {}
+
+def test_pipeline_retry_skips_completed_steps(capsys):
+    """
+    Test that resuming a pipeline after a step failed only runs the
+    steps that didn't complete, and returns the results of all steps.
+    """
+    mock_step_1 = Mock(return_value="step 1")
+    mock_step_2 = Mock(side_effect=[ValueError("Something went wrong"), "step 2"])
+
+    step_one = step(
+        callable=mock_step_1,
+        name="step_one",
+        description="Step one",
+        version="1.0.0",
+    )
+    step_two = step(
+        callable=mock_step_2,
+        name="step_two",
+        description="Step two",
+        version="1.0.0",
+    )
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return [step_one, step_two]
+
+    pipe = test_pipeline()
+    with pytest.raises(ValueError):
+        pipe.run()
+
+    capsys.readouterr()
+    results = pipe.run(resume=True)
+
+    mock_step_1.assert_called_once()
+    assert mock_step_2.call_count == 2
+    assert results == {step_one: "step 1", step_two: "step 2"}
+    assert "Step [step_one] completed in a previous run" in capsys.readouterr().out
+
+def test_pipeline_process_executor_max_workers(monkeypatch):
+    """
+    Test that a process pool defaults to at most one worker per CPU,
+    even if a stage has more steps than that.
+    """
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        executor="process",
+    )
+    def test_pipeline():
+        return {process_step_one: [], process_step_two: []}
+
+    pipe = test_pipeline()
+    executor_factory = Mock(wraps=pipe._executor_factory)
+    pipe._executor_factory = executor_factory
+    pipe.run()
+
+    executor_factory.assert_called_once_with(max_workers=1)
+
+def test_pipeline_thread_executor_max_workers(monkeypatch):
+    """
+    Test that a thread pool defaults to at most the number of CPUs plus 4
+    workers, even if a stage has more steps than that.
+    """
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+
+    stage = [
+        step(
+            callable=Mock(),
+            name=f"step_{i}",
+            description=f"Step {i}",
+            version="1.0.0",
+        )
+        for i in range(10)
+    ]
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        quiet=True,
+    )
+    def test_pipeline():
+        return {step: [] for step in stage}
+
+    pipe = test_pipeline()
+    executor_factory = Mock(wraps=pipe._executor_factory)
+    pipe._executor_factory = executor_factory
+    pipe.run()
+
+    executor_factory.assert_called_once_with(max_workers=5)
+
+def test_pipeline_failure_exception_in_thread_stage(capsys):
+    """
+    Test that the pipeline fails as soon as a step in a stage that runs in
+    a thread pool raises an exception, without waiting for the steps in the
+    stage that are still running.
+
+    Also check that the output says which steps did not complete.
+    """
+    release = threading.Event()
+    mock_step_3 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        raise Exception("Something went wrong")
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        release.wait(timeout=5)
+
+    @step(name="step_three", description="Step three", version="1.0.0")
+    def step_three():
+        mock_step_3()
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {step_one: [step_three], step_two: [step_three]}
+
+    pipe = test_pipeline()
+    start = time.perf_counter()
+    try:
+        with pytest.raises(Exception) as context:
+            pipe.run()
+
+        # step_two is blocked for up to 5 seconds unless it's released
+        assert time.perf_counter() - start < 2
+    finally:
+        release.set()
+
+    output = capsys.readouterr().out
+
+    assert "Something went wrong" == str(context.value)
+    assert "Pipeline failed due to an exception in step [step_one]" in output
+    assert (
+        "Step [step_two] did not complete because another step in its stage failed"
+        in output
+    )
+    mock_step_3.assert_not_called()
+
+def test_pipeline_failure_async_steps_in_running_event_loop():
+    """
+    Test that the pipeline fails with a RuntimeError if async steps are run
+    from a running event loop, e.g. in a Jupyter notebook, and that none of
+    the step coroutines are created.
+
+    Also check that the error message is correct.
+    """
+    mock_step_1 = Mock()
+    mock_step_2 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    async def step_one():
+        mock_step_1()
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    async def step_two():
+        mock_step_2()
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def linear_pipeline():
+        return [step_one]
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def nonlinear_pipeline():
+        return {step_one: [], step_two: []}
+
+    async def main(pipe):
+        pipe.run()
+
+    for test_pipeline in (linear_pipeline, nonlinear_pipeline):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            with pytest.raises(RuntimeError) as context:
+                asyncio.run(main(test_pipeline()))
+
+            gc.collect()
+
+        assert (
+            "Async steps can't be run from a running event loop, e.g. in a Jupyter "
+            "notebook. Run the pipeline in another thread instead, e.g. with "
+            "`await asyncio.to_thread(pipe.run)`."
+            == str(context.value)
+        )
+
+    mock_step_1.assert_not_called()
+    mock_step_2.assert_not_called()
+
+def test_pipeline_retry_after_failure_in_concurrent_stage(capsys):
+    """
+    Test that running a pipeline again right after a step in a concurrent
+    stage failed waits for the steps in the stage that were still running,
+    before running them again.
+
+    Also check that the output says which steps it's waiting for.
+    """
+    running = []
+    started = threading.Event()
+    mock_step_1 = Mock(side_effect=[ValueError("Something went wrong"), "step 1"])
+    mock_step_2 = Mock()
+
+    @step(name="step_one", description="Step one", version="1.0.0")
+    def step_one():
+        # only fail once step_two is running
+        started.wait(timeout=5)
+        return mock_step_1()
+
+    @step(name="step_two", description="Step two", version="1.0.0")
+    def step_two():
+        running.append(mock_step_2)
+        started.set()
+        mock_step_2(concurrent=len(running))
+        time.sleep(0.5)
+        running.remove(mock_step_2)
+        return "step 2"
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+    )
+    def test_pipeline():
+        return {step_one: [], step_two: []}
+
+    pipe = test_pipeline()
+    with pytest.raises(ValueError):
+        pipe.run()
+
+    capsys.readouterr()
+    results = pipe.run()
+
+    assert mock_step_2.call_args_list == [call(concurrent=1), call(concurrent=1)]
+    assert results == {step_one: "step 1", step_two: "step 2"}
+    assert (
+        "Waiting for step [step_two] from a previous run that failed"
+        in capsys.readouterr().out
+    )
+
+def test_pipeline_rerun_after_failure_runs_all_steps():
+    """
+    Test that running a pipeline again after a step failed runs all of
+    the steps again by default, including the ones that completed.
+    """
+    mock_step_1 = Mock(return_value="step 1")
+    mock_step_2 = Mock(side_effect=[ValueError("Something went wrong"), "step 2"])
+
+    step_one = step(
+        callable=mock_step_1,
+        name="step_one",
+        description="Step one",
+        version="1.0.0",
+    )
+    step_two = step(
+        callable=mock_step_2,
+        name="step_two",
+        description="Step two",
+        version="1.0.0",
+    )
+
+    @pipeline(
+        name="test_pipeline",
+        description="Test pipeline",
+        version="1.0.0",
+        quiet=True,
+    )
+    def test_pipeline():
+        return [step_one, step_two]
+
+    pipe = test_pipeline()
+    with pytest.raises(ValueError):
+        pipe.run()
+
+    results = pipe.run()
+
+    assert mock_step_1.call_count == 2
+    assert mock_step_2.call_count == 2
+    assert results == {step_one: "step 1", step_two: "step 2"}
+
+def test_linear_pipeline_imports_only_what_it_needs():
+    """
+    Test that importing tinypipeline and running a linear pipeline doesn't
+    import the modules that are only needed by nonlinear pipelines. This is
+    run in a new interpreter, since pytest has already imported them.
+    """
+    code = (
+        "import sys\n"
+        "from tinypipeline import pipeline, step\n"
+        "@step(name='step_one', description='Step one', version='1.0.0')\n"
+        "def step_one():\n"
+        "    pass\n"
+        "@pipeline(name='test', description='Test', version='1.0.0', quiet=True)\n"
+        "def test_pipeline():\n"
+        "    return [step_one]\n"
+        "test_pipeline().run()\n"
+        "modules = ('concurrent.futures', 'graphlib', 'pickle')\n"
+        "print(sorted(m for m in modules if m in sys.modules))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert output == "[]\n"
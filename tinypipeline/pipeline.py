@@ -1,19 +1,71 @@
 import functools
-
-from datetime import datetime
-from graphlib import CycleError, TopologicalSorter
-from typing import Callable, Union, Dict, List
-
-from .step import Step
+import os
+import sys
+import time
+
+from array import array
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+from .step import Step, _check_no_running_loop
+
+# asyncio, graphlib and concurrent.futures are imported when they're first
+# needed, to keep importing tinypipeline fast
+if TYPE_CHECKING:
+    import asyncio
+
+    from concurrent.futures import Executor, Future
+
+_NOT_A_STEP_MSG = (
+    "Not a valid step. Consider using the step decorator "
+    "to create steps for your pipeline."
+)
+_NOT_A_LIST_OR_DICT_MSG = "Pipeline steps must be in a list or a dict."
+_NOT_A_FUNCTION_MSG = "The pipeline decorator only accepts functions. Passed {}"
+_INVALID_EXECUTOR_MSG = (
+    "Pipeline executor must be 'thread', 'process' or an Executor. Passed {!r}"
+)
+_NO_STEPS_MSG = "Pipeline {} has no steps to run."
+_CYCLE_MSG = (
+    "Pipeline failed due to an exception in step ordering. "
+    "Try checking for circular dependencies in your steps.\n\n"
+)
+_STEP_FAILED_MSG = "Pipeline failed due to an exception in step [{}]\n"
+_STEP_NOT_COMPLETED_MSG = (
+    "Step [{}] did not complete because another step in its stage failed\n"
+)
+_STEP_SKIPPED_MSG = "Step [{}] completed in a previous run, skipping it\n\n"
+_STEP_WAITING_MSG = (
+    "Waiting for step [{}] from a previous run that failed to complete...\n"
+)
 
 
 class Pipeline:
+    __slots__ = (
+        '_func',
+        'name',
+        'version',
+        'description',
+        'max_workers',
+        'quiet',
+        'steps',
+        'ordering',
+        '_plan',
+        '_executor',
+        '_executor_factory',
+        '_header',
+        '_results',
+        '_running',
+    )
+
     def __init__(
         self,
         func: Callable,
         name: str,
         version: str,
         description: str,
+        max_workers: Optional[int] = None,
+        executor: Union[str, 'Executor'] = 'thread',
+        quiet: bool = False,
     ) -> None:
         """
         A pipeline is a collection of steps that are run in order.
@@ -30,42 +82,74 @@ class Pipeline:
             The version of the pipeline.
         description: str
             A description of the pipeline.
+        max_workers: Optional[int]
+            The maximum number of steps that are run concurrently within a
+            stage of a nonlinear pipeline. Defaults to the number of steps
+            in the largest stage, capped at the number of CPUs if the steps
+            are run in a process pool, or at the number of CPUs plus 4, and
+            at most 32, if they're run in a thread pool. Ignored if an
+            `Executor` instance is passed as `executor`.
+        executor: Union[str, Executor]
+            How the steps of a nonlinear pipeline are run. Either 'thread' to
+            run the steps within a stage concurrently in a thread pool, and a
+            stage with a single step in the current thread, 'process' to run
+            every step in a process pool (for CPU-bound steps, whose callables
+            and results must be picklable, or the step fails), or an `Executor`
+            instance to run every step on, which is used as is and not shut
+            down.
+        quiet: bool
+            Whether to skip writing the pipeline banner and the progress
+            of each step to stdout when the pipeline is run.
         """
         self._func = func
 
         self.name = name
         self.version = version
         self.description = description
+        self.max_workers = max_workers
+        self.quiet = quiet
+        self._plan = None
+        self._results = {}
+        self._running = {}
+
+        self._executor = executor
+        if executor == 'thread':
+            self._executor_factory = _thread_pool
+        elif executor == 'process':
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor_factory = ProcessPoolExecutor
+        else:
+            from concurrent.futures import Executor
 
-    @functools.cached_property
-    def steps(self) -> Union[List[Step], Dict[Step, Step]]:
-        """
-        The steps for the pipeline. Cached property so that the function
-        containing the steps is only called once.
+            if not isinstance(executor, Executor):
+                raise ValueError(_INVALID_EXECUTOR_MSG.format(executor))
 
-        Returns
-        -------
-        Union[List[Step], Dict[Step, Step]]
-            The steps for the pipeline.
-        """
-        return self._func()
+            self._executor_factory = None
+
+        self._header = self._build_header()
 
-    @property
-    def ordering(self) -> str:
+        # the function containing the steps is only called once,
+        # when the pipeline is created
+        self.steps: Union[list[Step], dict[Step, list[Step]]] = self._func()
+        self.ordering = self._get_ordering()
+
+    def _get_ordering(self) -> str:
         """
-        The ordering of the steps in the pipeline. Either linear or nonlinear.
+        Private method to get the ordering of the steps in the pipeline.
+        Either linear or nonlinear.
 
         Returns
         -------
         str
             'linear' or 'nonlinear'.
         """
-        if isinstance(self.steps, List):
+        if isinstance(self.steps, list):
             _ordering = 'linear'
-        elif isinstance(self.steps, Dict):
+        elif isinstance(self.steps, dict):
             _ordering = 'nonlinear'
         else:
-            raise TypeError("Pipeline steps must be in a list or a dict.")
+            raise TypeError(_NOT_A_LIST_OR_DICT_MSG)
 
         return _ordering
 
@@ -75,39 +159,264 @@ class Pipeline:
         """
         return f"Pipeline(name='{self.name}', version='{self.version}')"
 
-    def _get_steps(self):
+    def _build_header(self) -> str:
+        """
+        Private method to build the banner that is written when the
+        pipeline is run.
+        """
+        border = f"+--------------------{len(str(self)) * '-'}+"
+        title = f"| Running pipeline: {str(self)} |"
+        return "\n".join((border, title, border, "\n"))
+
+    def _get_steps(self) -> Union[tuple[Step, ...], list[tuple[Step, ...]]]:
         """
         Private method to order the steps for the pipeline.
 
         Uses `self.steps` if the ordering is linear (a list of steps)
-        and uses a reversed topological sort on `self.steps` if the ordering
-        is nonlinear (a dictionary).
+        and groups the steps into stages using Kahn's algorithm on
+        `self.steps` if the ordering is nonlinear (a dictionary). Steps
+        within a stage have no dependencies on each other, so they can be
+        run concurrently.
         """
         # if the steps are in a list, just return them in order
-        # in which they were defined
+        # in which they were defined, frozen into a tuple
         if self.ordering == 'linear':
-            _steps = self.steps
+            for step in self.steps:
+                if not isinstance(step, Step):
+                    raise TypeError(_NOT_A_STEP_MSG)
+
+            _steps = tuple(self.steps)
 
-        # if the steps are in a dictionary, return them in a topologically
-        # sorted order, based on the dependencies defined in the dictionary.
-        # then reverse the order since keys in the dictionary are the steps
-        # and values are the dependencies.
+        # if the steps are in a dictionary, return them in topologically
+        # sorted stages, based on the dependencies defined in the dictionary.
+        # keys in the dictionary are the steps and values are the steps that
+        # run after them, so each value depends on its key.
         elif self.ordering == 'nonlinear':
-            ts = TopologicalSorter(graph=self.steps)
-            toposorted_steps = list(ts.static_order())
-            _steps = list(reversed(toposorted_steps))
-
-        if not all(isinstance(s, Step) for s in self.steps):
-            raise TypeError(
-                "Not a valid step. Consider using the step decorator "
-                "to create steps for your pipeline."
-            )
+            # give each step a dense int id, keys first, so that the steps
+            # that run after a step (its row) can be stored contiguously in
+            # `indices`, from `indptr[id]` up to `indptr[id + 1]`
+            step_ids = {}
+            for step in self.steps:
+                if not isinstance(step, Step):
+                    raise TypeError(_NOT_A_STEP_MSG)
+
+                step_ids[step] = len(step_ids)
+
+            dep_count = array('i', [0]) * len(step_ids)
+            indptr = array('i', [0])
+            indices = array('i')
+            for _dependents in self.steps.values():
+                for dependent in _dependents:
+                    # validate steps that are only values the first time
+                    # they're seen, and give them the next id
+                    if dependent not in step_ids:
+                        if not isinstance(dependent, Step):
+                            raise TypeError(_NOT_A_STEP_MSG)
+
+                        step_ids[dependent] = len(step_ids)
+                        dep_count.append(0)
+
+                    dependent_id = step_ids[dependent]
+                    indices.append(dependent_id)
+                    dep_count[dependent_id] += 1
+
+                indptr.append(len(indices))
+
+            # steps that are only values don't have any steps after them
+            indptr.extend([len(indices)] * (len(step_ids) - len(self.steps)))
+
+            # each stage is the set of steps whose dependencies have all
+            # run in the previous stages. the dependency counts are
+            # decremented in place, since they aren't needed afterwards
+            steps_by_id = list(step_ids)
+            ready = [i for i, count in enumerate(dep_count) if count == 0]
+            _steps = []
+            while ready:
+                _steps.append(tuple(steps_by_id[i] for i in ready))
+
+                next_ready = []
+                for i in ready:
+                    for dependent_id in indices[indptr[i]:indptr[i + 1]]:
+                        dep_count[dependent_id] -= 1
+                        if dep_count[dependent_id] == 0:
+                            next_ready.append(dependent_id)
+
+                ready = next_ready
+
+            if sum(len(stage) for stage in _steps) != len(step_ids):
+                from graphlib import CycleError
+
+                cycle = _find_cycle(dep_count, indptr, indices)
+                cycle = [steps_by_id[i] for i in cycle]
+                raise CycleError("nodes are in a cycle", cycle)
 
         return _steps
 
-    def run(self) -> None:
+    def _skip_completed(self, steps: tuple[Step, ...]) -> tuple[Step, ...]:
+        """
+        Private method to leave out the steps that have a result from a
+        previous run that failed, so that a retry doesn't run them again.
+        """
+        if not self._results:
+            return steps
+
+        if not self.quiet:
+            skipped = (
+                _STEP_SKIPPED_MSG.format(step.name)
+                for step in steps
+                if step in self._results
+            )
+            sys.stdout.write("".join(skipped))
+
+        return tuple(step for step in steps if step not in self._results)
+
+    def _wait_for_running(self) -> None:
+        """
+        Private method to wait for the steps that were still running when a
+        stage of a previous run failed, and keep the results of the ones that
+        completed, so that a retry doesn't run them again at the same time.
+        """
+        if not self._running:
+            return
+
+        from concurrent.futures import wait
+
+        running, self._running = self._running, {}
+        if not self.quiet:
+            waiting = (
+                _STEP_WAITING_MSG.format(step.name) for step in running.values()
+            )
+            sys.stdout.write("".join(waiting))
+
+        wait(running)
+        for future, step in running.items():
+            if future.exception() is None:
+                self._results[step], _ = future.result()
+
+    def _run_step(self, step: Step) -> None:
         """
-        Run the pipeline steps in order and return None.
+        Private method to run a single step in the current thread.
+        """
+        if self.quiet:
+            self._results[step] = step.run()
+            return
+
+        try:
+            sys.stdout.write(f"Running step [{step.name}]...\n")
+            self._results[step], completion_time = _time_step(step)
+            sys.stdout.write(
+                f"Step [{step.name}] completed in {completion_time} seconds\n\n"
+            )
+        except Exception:
+            sys.stdout.write(_STEP_FAILED_MSG.format(step.name))
+            raise
+
+    def _run_stage(
+        self,
+        stage: tuple[Step, ...],
+        executor: 'Executor',
+    ) -> None:
+        """
+        Private method to run the steps of a single stage concurrently
+        using `executor`.
+
+        Waits until every step in the stage has completed, or until the
+        first step raises an exception. In that case the steps that haven't
+        started yet are cancelled, the steps that are still running are left
+        to finish in the background and kept for the next run to wait for,
+        and the exception is re-raised. If any of the steps are async, the
+        stage is run in an event loop instead.
+        """
+        is_async = any(step._is_async for step in stage)
+        if is_async:
+            _check_no_running_loop()
+
+        # the output of a stage is buffered, so that it's written
+        # in one call before and one call after the steps are run
+        quiet = self.quiet
+        if not quiet:
+            running = (f"Running step [{step.name}]...\n" for step in stage)
+            sys.stdout.write("".join(running))
+
+        if is_async:
+            import asyncio
+
+            # sync steps are submitted to the executor outside of the event
+            # loop, so that the ones that are still running can be kept
+            submitted = {
+                step: executor.submit(_time_step, step)
+                for step in stage
+                if not step._is_async
+            }
+            futures, done = asyncio.run(_run_stage_async(stage, submitted))
+            not_done = {
+                submitted[step]: step
+                for future, step in futures.items()
+                if future not in done and step in submitted
+            }
+        else:
+            from concurrent.futures import FIRST_EXCEPTION, wait
+
+            futures = {executor.submit(_time_step, step): step for step in stage}
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            not_done = {future: futures[future] for future in not_done}
+
+        # cancel the steps that haven't started yet, and keep the ones that
+        # are still running, so that a retry doesn't run them a second time
+        # while they're running
+        self._running = {
+            future: step
+            for future, step in not_done.items()
+            if not future.cancel()
+        }
+
+        # the output of the steps is only built if it's written
+        buf = None if quiet else []
+        failed = None
+        for future, step in futures.items():
+            if future not in done:
+                if buf is not None:
+                    buf.append(_STEP_NOT_COMPLETED_MSG.format(step.name))
+                continue
+
+            if future.exception() is not None:
+                failed = failed or future
+                if buf is not None:
+                    buf.append(_STEP_FAILED_MSG.format(step.name))
+            else:
+                self._results[step], completion_time = future.result()
+                if buf is not None:
+                    buf.append(
+                        f"Step [{step.name}] completed in "
+                        f"{completion_time} seconds\n\n"
+                    )
+
+        if buf is not None:
+            sys.stdout.write("".join(buf))
+
+        # re-raise the exception of the first step in the stage that failed
+        if failed is not None:
+            failed.result()
+
+    def run(self, resume: bool = False) -> dict[Step, Any]:
+        """
+        Run the pipeline steps in order and return the result of each step.
+
+        Every step is run, unless `resume` is True. Steps of a failed stage
+        of a previous run that are still running are waited for first.
+
+        Params
+        ------
+        resume: bool
+            Whether to retry a previous run that failed, by only running the
+            steps that didn't complete in it and reusing the results of the
+            ones that did. The results aren't checked in any way, e.g. against
+            the inputs of the steps, so only resume right after a failure.
+
+        Returns
+        -------
+        dict[Step, Any]
+            The result of each step.
 
         Raises
         ------
@@ -115,36 +424,177 @@ class Pipeline:
             If there is an exception in any of the steps.
         """
         if not self.steps or self.steps is None:
-            raise Exception(f"Pipeline {self.name} has no steps to run.")
+            raise Exception(_NO_STEPS_MSG.format(self.name))
+
+        if not self.quiet:
+            sys.stdout.write(self._header)
 
-        border = f"+--------------------{len(str(self)) * '-'}+\n"
-        header = f"{border}" f"| Running pipeline: {str(self)} |\n" f"{border}"
-        print(header)
+        self._wait_for_running()
+        if not resume:
+            self._results = {}
 
         # run steps in linear or nonlinear order depending
-        # on the ordering property of the pipeline
-        try:
-            step_order = self._get_steps()
-        except CycleError:
-            print(
-                "Pipeline failed due to an exception in step ordering. "
-                "Try checking for circular dependencies in your steps.\n"
-            )
-            raise
+        # on the ordering property of the pipeline. the order is only
+        # computed on the first run and reused by later runs
+        if self._plan is None:
+            if self.ordering == 'linear':
+                self._plan = self._get_steps()
+            else:
+                # only nonlinear pipelines can have a cycle, so graphlib
+                # isn't imported for linear ones
+                from graphlib import CycleError
+
+                try:
+                    self._plan = self._get_steps()
+                except CycleError:
+                    if not self.quiet:
+                        sys.stdout.write(_CYCLE_MSG)
+                    raise
+
+        step_order = self._plan
+
+        # linear pipelines run their steps one after another, nonlinear
+        # pipelines run each stage of independent steps concurrently
+        # on an executor that is shared by all stages of the run
+        if self.ordering == 'linear':
+            for step in self._skip_completed(step_order):
+                self._run_step(step)
+        else:
+            max_workers = self.max_workers
+            if max_workers is None:
+                max_workers = max(len(stage) for stage in step_order)
+
+                # CPU-bound steps in a process pool don't gain anything from
+                # more worker processes than there are CPUs, and threads are
+                # capped like the default of ThreadPoolExecutor, so that a
+                # very wide stage doesn't start a thread for every step
+                if self._executor == 'process':
+                    max_workers = min(max_workers, os.cpu_count() or 1)
+                elif self._executor == 'thread':
+                    max_workers = min(
+                        max_workers, 32, (os.cpu_count() or 1) + 4
+                    )
+
+            if self._executor_factory is None:
+                executor = self._executor
+            else:
+                executor = self._executor_factory(max_workers=max_workers)
 
-        for step in step_order:
             try:
-                print(f"Running step [{step.name}]...")
+                for stage in step_order:
+                    stage = self._skip_completed(stage)
+                    # a stage with a single step doesn't need a thread pool,
+                    # but a process pool or an executor that was passed in
+                    # is used for every step
+                    if len(stage) == 1 and self._executor == 'thread':
+                        self._run_step(stage[0])
+                    elif stage:
+                        self._run_stage(stage, executor)
+            except BaseException:
+                # don't wait for the steps of a failed stage that are
+                # still running, unless the executor was passed in
+                if executor is not self._executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                raise
 
-                start = datetime.now()
-                step.run()
-                end = datetime.now()
+            if executor is not self._executor:
+                executor.shutdown()
 
-                completion_time = (end - start).total_seconds()
-                print(f"Step [{step.name}] completed in {completion_time} seconds\n")
-            except Exception:
-                print(f"Pipeline failed due to an exception in step [{step.name}]")
-                raise
+        # the results are only kept across runs until a run succeeds
+        results, self._results = self._results, {}
+        return results
+
+
+def _find_cycle(remaining: array, indptr: array, indices: array) -> list[int]:
+    """
+    Find one cycle among the step ids that Kahn's algorithm couldn't reach.
+
+    Every id that is left has a dependency that is also left, so following
+    the dependencies from any of them ends up in a cycle. The cycle is
+    returned with its first id repeated at the end and each id followed by
+    a dependency of it, i.e. against run order, which is the order that
+    `graphlib.TopologicalSorter` reported it in.
+    """
+    # one dependency that is left for each id that is left
+    dependency = {}
+    for i, count in enumerate(remaining):
+        if count > 0:
+            for dependent_id in indices[indptr[i]:indptr[i + 1]]:
+                if remaining[dependent_id] > 0:
+                    dependency.setdefault(dependent_id, i)
+
+    path = [next(i for i, count in enumerate(remaining) if count > 0)]
+    seen = {path[0]: 0}
+    while True:
+        i = dependency[path[-1]]
+        if i in seen:
+            break
+
+        seen[i] = len(path)
+        path.append(i)
+
+    return path[seen[i]:] + [i]
+
+
+def _thread_pool(max_workers: Optional[int] = None) -> 'Executor':
+    """
+    Create the thread pool that the stages of a nonlinear pipeline are run
+    on, importing it only when it's first needed.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+def _time_step(step: Step) -> tuple[Any, float]:
+    """
+    Run a single step and return its result and completion time in seconds.
+    """
+    start = time.perf_counter_ns()
+    result = step.run()
+
+    return result, (time.perf_counter_ns() - start) / 1e9
+
+
+async def _time_step_async(step: Step) -> tuple[Any, float]:
+    """
+    Run a single async step and return its result and completion time
+    in seconds.
+    """
+    start = time.perf_counter_ns()
+    result = await step.arun()
+
+    return result, (time.perf_counter_ns() - start) / 1e9
+
+
+async def _run_stage_async(
+    stage: tuple[Step, ...],
+    submitted: dict[Step, 'Future'],
+) -> tuple[dict['asyncio.Future', Step], set['asyncio.Future']]:
+    """
+    Run the steps of a stage concurrently in the running event loop.
+
+    Async steps are run as tasks, and sync steps are waited for through
+    their future in `submitted`, since they've already been submitted to an
+    executor so that they don't block the event loop. Returns the future of
+    each step and the futures that are done, once every step has completed
+    or the first step has raised an exception, which cancels the rest.
+    """
+    import asyncio
+
+    futures = {
+        (
+            asyncio.ensure_future(_time_step_async(step))
+            if step._is_async
+            else asyncio.wrap_future(submitted[step])
+        ): step
+        for step in stage
+    }
+    done, pending = await asyncio.wait(futures, return_when=asyncio.FIRST_EXCEPTION)
+    for future in pending:
+        future.cancel()
+
+    return futures, done
 
 
 def pipeline(
@@ -152,6 +602,9 @@ def pipeline(
     name: str,
     version: str,
     description: str,
+    max_workers: Optional[int] = None,
+    executor: Union[str, 'Executor'] = 'thread',
+    quiet: bool = False,
 ):
     """
     Decorator to create a pipeline.
@@ -164,6 +617,14 @@ def pipeline(
         The version of the pipeline.
     description: str
         A description of the pipeline.
+    max_workers: Optional[int]
+        The maximum number of steps that are run concurrently within a
+        stage of a nonlinear pipeline.
+    executor: Union[str, Executor]
+        How the steps within a stage are run concurrently. Either 'thread',
+        'process' or an `Executor` instance.
+    quiet: bool
+        Whether to skip writing the progress of the pipeline to stdout.
     """
 
     def decorator(func):
@@ -172,17 +633,17 @@ def pipeline(
             """
             Wrapper function for the pipeline decorator.
             """
-            if not isinstance(func, Callable):
-                raise TypeError(
-                    "The pipeline decorator only accepts functions. "
-                    f"Passed {type(func)}"
-                )
+            if not callable(func):
+                raise TypeError(_NOT_A_FUNCTION_MSG.format(type(func)))
 
             _pipeline = Pipeline(
                 func=func,
                 name=name,
                 version=version,
                 description=description,
+                max_workers=max_workers,
+                executor=executor,
+                quiet=quiet,
             )
             return _pipeline
 
@@ -1,13 +1,38 @@
-from typing import Callable
+import functools
+import importlib
+import inspect
+import sys
+
+from typing import Any, Callable, Optional
+
+_RUNNING_LOOP_MSG = (
+    "Async steps can't be run from a running event loop, e.g. in a Jupyter "
+    "notebook. Run the pipeline in another thread instead, e.g. with "
+    "`await asyncio.to_thread(pipe.run)`."
+)
 
 
 class Step:
+    __slots__ = (
+        '_callable',
+        '_args',
+        '_kwargs',
+        '_bound',
+        '_is_async',
+        'run',
+        'name',
+        'version',
+        'description',
+    )
+
     def __init__(
         self,
         callable: Callable,
         name: str,
         version: str,
         description: str,
+        args: tuple = (),
+        kwargs: Optional[dict[str, Any]] = None,
     ) -> None:
         """
         A step is a single unit of work in a pipeline.
@@ -15,15 +40,20 @@ class Step:
         Params
         ------
         callable: Callable
-            The function that is called when the step is run.
+            The function that is called when the step is run. Can be a
+            coroutine function, e.g. for I/O-bound steps.
         name: str
             The name of the step.
         version: str
             The version of the step.
         description: str
             A description of the step.
+        args: tuple
+            Positional arguments that the callable is called with.
+        kwargs: Optional[dict[str, Any]]
+            Keyword arguments that the callable is called with.
         """
-        self._callable = callable
+        self._set_callable(callable, args, kwargs or {})
         self.name = name
         self.version = version
         self.description = description
@@ -34,12 +64,110 @@ class Step:
         """
         return f"Step(name='{self.name}', version='{self.version}')"
 
-    def run(self):
+    def _set_callable(
+        self,
+        callable: Callable,
+        args: tuple,
+        kwargs: dict[str, Any],
+    ) -> None:
+        """
+        Private method to set the callable of the step, and bind `run`.
+
+        The callable is bound to its arguments once with `functools.partial`,
+        or used as is if there are no arguments. `run` runs the step and
+        returns the result of the callable. It is the bound callable itself,
+        so running a step doesn't go through an extra method call, except for
+        a coroutine function, which is run in a new event loop.
+        """
+        self._callable = callable
+        self._args = args
+        self._kwargs = kwargs
+        if args or kwargs:
+            self._bound = functools.partial(callable, *args, **kwargs)
+        else:
+            self._bound = callable
+        self._is_async = inspect.iscoroutinefunction(callable)
+
+        if self._is_async:
+            self.run = functools.partial(_run_coroutine_function, self._bound)
+        else:
+            self.run = self._bound
+
+    def __getstate__(self):
+        """
+        State of the step used for pickling, e.g. when the step is run in
+        a process pool.
+
+        The step decorator replaces the callable in its module with the step,
+        so a decorated callable can't be pickled by reference. In that case
+        the callable is excluded from the state and replaced with the location
+        of the step, which is used to look the callable up when unpickling.
+        Attributes that are derived from the callable are set again when
+        unpickling, so they are excluded too.
+        """
+        state = {
+            '_callable': self._callable,
+            '_args': self._args,
+            '_kwargs': self._kwargs,
+            'name': self.name,
+            'version': self.version,
+            'description': self.description,
+        }
+
+        module = getattr(self._callable, '__module__', None)
+        qualname = getattr(self._callable, '__qualname__', None)
+        if module and qualname:
+            if getattr(sys.modules.get(module), qualname, None) is self:
+                state['_callable'] = (module, qualname)
+
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore the step from its pickled state.
         """
-        Run the step.
+        callable = state.pop('_callable')
+        if isinstance(callable, tuple):
+            module, qualname = callable
+            callable = getattr(importlib.import_module(module), qualname)._callable
+
+        self._set_callable(callable, state.pop('_args'), state.pop('_kwargs'))
+        for attr, value in state.items():
+            setattr(self, attr, value)
+
+    async def arun(self):
         """
-        self._callable()
-        return None
+        Run the step in the running event loop and return the result of
+        the callable. Only for steps whose callable is a coroutine function.
+        """
+        return await self._bound()
+
+
+def _check_no_running_loop() -> None:
+    """
+    Raise a RuntimeError if there is a running event loop in this thread,
+    since async steps are run in a new event loop with `asyncio.run`.
+    """
+    import asyncio
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    raise RuntimeError(_RUNNING_LOOP_MSG)
+
+
+def _run_coroutine_function(func: Callable):
+    """
+    Run a coroutine function in a new event loop and return its result.
+    """
+    import asyncio
+
+    # check before the coroutine is created, so that it isn't left
+    # unawaited if it can't be run
+    _check_no_running_loop()
+    return asyncio.run(func())
 
 
 def step(